@@ -1,5 +1,17 @@
 """API key manager with rotation and quota tracking."""
 
+import threading
+import time
+from collections import deque
+from config import (
+    BACKOFF_CAP,
+    KEY_RATE_LIMIT,
+    KEY_RATE_WINDOW,
+    KEY_RATE_HEADROOM,
+    PACING_INCREASE,
+    PACING_DECREASE,
+)
+
 
 class APIManager:
     """Manages multiple API keys with automatic rotation on quota exhaustion."""
@@ -18,6 +30,24 @@ class APIManager:
         self.current_index = 0
         self.exhausted_indices = set()
 
+        # Set once any key has been rate limited or run out of quota
+        self.quota_pressure = False
+
+        # Indices of keys not yet exhausted, in rotation order; the
+        # current key is always at the left end
+        self._available = deque(range(len(credentials)))
+
+        # Consecutive 429 responses per key (reset on success)
+        self._rate_limit_streaks = [0] * len(credentials)
+
+        # Client-side pacing per key: start times of recent requests, and a
+        # minimum gap between requests grown on 429s and shrunk on success
+        self._request_times = [deque() for _ in credentials]
+        self._pacing_gaps = [0.0] * len(credentials)
+
+        # Serializes rotation when several searches hit quota errors at once
+        self._lock = threading.Lock()
+
     def get_current_credentials(self) -> tuple[str, str]:
         """
         Get the current API key and CX pair.
@@ -37,35 +67,102 @@ class APIManager:
 
     def mark_current_exhausted(self):
         """Mark the current API key as quota exhausted."""
+        self.quota_pressure = True
+        if self._available and self._available[0] == self.current_index:
+            self._available.popleft()
         self.exhausted_indices.add(self.current_index)
 
-    def rotate_to_next(self) -> bool:
+    def rotate_to_next(self, failed_index: int | None = None) -> bool:
         """
         Rotate to the next available API key.
 
+        Args:
+            failed_index: Index of the key the caller saw fail. If another
+                caller has already rotated away from it, the current key is
+                left alone.
+
         Returns:
             True if successfully rotated, False if all keys exhausted
         """
-        # Mark current as exhausted
-        self.mark_current_exhausted()
-
-        # Find next available key
-        for i in range(len(self.credentials)):
-            next_index = (self.current_index + 1 + i) % len(self.credentials)
-            if next_index not in self.exhausted_indices:
-                self.current_index = next_index
+        with self._lock:
+            if failed_index is not None and failed_index != self.current_index:
+                return bool(self._available)
+
+            # Mark current as exhausted
+            self.mark_current_exhausted()
+
+            # Next available key is now at the front
+            if self._available:
+                self.current_index = self._available[0]
                 return True
 
-        return False
+            return False
+
+    def throttle(self, index: int):
+        """
+        Wait until a request on a key fits its pacing, then claim the slot.
+
+        Requests are deferred once the key has used KEY_RATE_HEADROOM of
+        KEY_RATE_LIMIT within the last KEY_RATE_WINDOW seconds, and are
+        spaced at least the key's current pacing gap apart.
+
+        Args:
+            index: Index of the key about to be used
+        """
+        allowed = max(1, int(KEY_RATE_LIMIT * KEY_RATE_HEADROOM))
+
+        with self._lock:
+            now = time.monotonic()
+            request_times = self._request_times[index]
+            while request_times and now - request_times[0] >= KEY_RATE_WINDOW:
+                request_times.popleft()
+
+            start = now
+            if len(request_times) >= allowed:
+                start = request_times[-allowed] + KEY_RATE_WINDOW
+            if request_times:
+                start = max(start, request_times[-1] + self._pacing_gaps[index])
+            request_times.append(start)
+
+        if start > now:
+            time.sleep(start - now)
+
+    def record_rate_limited(self, index: int) -> int:
+        """
+        Record a 429 response for a key, widening its pacing gap.
+
+        Returns:
+            Number of consecutive 429s seen for that key
+        """
+        with self._lock:
+            self.quota_pressure = True
+            self._rate_limit_streaks[index] += 1
+            self._pacing_gaps[index] = min(
+                max(self._pacing_gaps[index] * PACING_INCREASE, KEY_RATE_WINDOW / KEY_RATE_LIMIT),
+                BACKOFF_CAP
+            )
+            return self._rate_limit_streaks[index]
+
+    def record_success(self, index: int):
+        """Record a successful request for a key, clearing its 429 streak."""
+        self._rate_limit_streaks[index] = 0
+        if self._pacing_gaps[index]:
+            with self._lock:
+                self._pacing_gaps[index] = max(0.0, self._pacing_gaps[index] - PACING_DECREASE)
 
     def has_available_keys(self) -> bool:
         """Check if any API keys are still available."""
-        return len(self.exhausted_indices) < len(self.credentials)
+        return bool(self._available)
 
     def reset_exhausted(self):
         """Reset all keys to available (for new day)."""
         self.exhausted_indices.clear()
+        self.quota_pressure = False
         self.current_index = 0
+        self._available = deque(range(len(self.credentials)))
+        self._rate_limit_streaks = [0] * len(self.credentials)
+        self._request_times = [deque() for _ in self.credentials]
+        self._pacing_gaps = [0.0] * len(self.credentials)
 
     def get_status(self) -> dict:
         """Get current status for display."""
@@ -1,5 +1,6 @@
 """Configuration module for the pothole image scraper."""
 
+import functools
 import os
 from dotenv import load_dotenv
 
@@ -16,6 +17,37 @@ DEFAULT_OUTPUT_DIR = "D:\Personal\Images\Potholes"
 DEFAULT_COUNT = 100
 DEFAULT_QUERIES_FILE = "queries.txt"
 PROGRESS_FILE = "progress.json"
+HASH_LOG_FILE = "seen_hashes.log"
+URL_LOG_FILE = "seen_urls.tsv"
+SAVE_INTERVAL = 5.0  # Minimum seconds between progress file writes
+LOG_FILE = "scraper.log"
+
+# Search settings
+SEARCH_WORKERS = 4  # Concurrent (query, filter) searches
+SEARCH_LOOKAHEAD = 2  # Searches run ahead of the downloads, across queries
+SEARCH_PAGE_WAVE = 3  # Result pages of one search requested at a time
+SEARCH_POOL_SIZE = 50  # Keep-alive connections to the search API
+SEARCH_MAX_RETRIES = 5  # Retries of a page on connection errors and 5xx responses
+BACKOFF_BASE = 1.0  # Minimum retry delay in seconds
+BACKOFF_CAP = 30.0  # Maximum retry delay in seconds
+RATE_LIMIT_ROTATE_STREAK = 2  # Consecutive 429s before a key is rotated out
+KEY_RATE_LIMIT = 100  # Requests allowed per key per KEY_RATE_WINDOW
+KEY_RATE_WINDOW = 60.0  # Seconds over which KEY_RATE_LIMIT applies
+KEY_RATE_HEADROOM = 0.9  # Fraction of KEY_RATE_LIMIT used before pacing
+PACING_INCREASE = 2.0  # Factor applied to a key's request gap on each 429
+PACING_DECREASE = 0.05  # Seconds taken off a key's request gap on each success
+# Partial response: only the parts of each page the scraper reads
+SEARCH_FIELDS = "items(link,title,image/contextLink),searchInformation/totalResults"
+CACHE_DIR = ".cse_cache"  # On-disk cache of search API responses
+CACHE_TTL = 24 * 60 * 60  # Seconds a cached response stays valid
+
+# Download settings
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # Bytes read/hashed/written per streaming step
+DOWNLOAD_WRITE_BUFFER = 1 << 20  # 1 MiB file buffer for image writes
+DOWNLOAD_WORKERS = 16  # Concurrent image downloads per batch
+DOWNLOAD_POOL_SIZE = 32  # Keep-alive connections kept per host
+DOWNLOAD_TIMEOUT = (5, 25)  # (connect, read) timeout in seconds
+PROGRESS_REDRAW_INTERVAL = 0.1  # Minimum seconds between progress bar redraws
 
 # Filter configurations
 DATE_FILTERS = ['d30', 'm6', 'y1', 'y5']
@@ -26,6 +58,7 @@ USE_DATE_FILTERS = False  # Set True to enable date filters
 USE_SIZE_FILTERS = True   # Set True to enable size filters (recommended)
 
 
+@functools.lru_cache(maxsize=1)
 def load_api_credentials():
     """
     Load CX ID and multiple API keys from environment variables.
@@ -35,20 +68,22 @@ def load_api_credentials():
         API_KEY_1, API_KEY_2, ... = multiple API keys for quota rotation
 
     Falls back to legacy format (API_KEY_1/CX_1 pairs) for compatibility.
+    The environment is scanned once; later calls return the cached result.
 
     Returns:
-        List of tuples: [(api_key, cx), ...]
+        Tuple of (api_key, cx) pairs
     """
+    env = os.environ
     credentials = []
 
     # New format: Single CX with multiple API keys
-    cx = os.getenv("CX")
+    cx = env.get("CX")
 
     if cx:
         # Load all API_KEY_N entries
         index = 1
         while True:
-            api_key = os.getenv(f"API_KEY_{index}")
+            api_key = env.get(f"API_KEY_{index}")
             if api_key:
                 credentials.append((api_key, cx))
                 index += 1
@@ -57,7 +92,7 @@ def load_api_credentials():
 
         # Also check for unnumbered API_KEY
         if not credentials:
-            api_key = os.getenv("API_KEY")
+            api_key = env.get("API_KEY")
             if api_key:
                 credentials.append((api_key, cx))
 
@@ -65,8 +100,8 @@ def load_api_credentials():
     if not credentials:
         index = 1
         while True:
-            api_key = os.getenv(f"API_KEY_{index}")
-            cx_n = os.getenv(f"CX_{index}")
+            api_key = env.get(f"API_KEY_{index}")
+            cx_n = env.get(f"CX_{index}")
 
             if api_key and cx_n:
                 credentials.append((api_key, cx_n))
@@ -74,7 +109,7 @@ def load_api_credentials():
             else:
                 break
 
-    return credentials
+    return tuple(credentials)
 
 
 def validate_config():
@@ -87,4 +122,4 @@ def validate_config():
             "(or legacy API_KEY_1/CX_1 pairs) in .env file."
         )
 
-    return credentials
+    return list(credentials)
@@ -1,14 +1,41 @@
 """Image downloader with SHA-256 deduplication."""
 
+import hashlib
 import os
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 import requests
-from utils import compute_hash, sanitize_filename, get_file_extension
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import (
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_WRITE_BUFFER,
+    DOWNLOAD_WORKERS,
+    DOWNLOAD_POOL_SIZE,
+    DOWNLOAD_TIMEOUT,
+    PROGRESS_REDRAW_INTERVAL,
+)
+from utils import sanitize_filename, get_file_extension, is_image_content_type
 from progress_tracker import ProgressTracker
 
+# Mode open() would give a new file under the current umask; mkstemp always
+# uses 0600, and saved images are renamed temp files
+_umask = os.umask(0)
+os.umask(_umask)
+IMAGE_FILE_MODE = 0o666 & ~_umask
+del _umask
+
 
 class ImageDownloader:
     """Downloads images with content-based deduplication."""
 
+    # Slots of the batch statistics list
+    STAT_SAVED = 0
+    STAT_DUPLICATES = 1
+    STAT_ERRORS = 2
+    STAT_SKIPPED = 3
+
     def __init__(
         self,
         output_dir: str,
@@ -24,59 +51,99 @@ class ImageDownloader:
             prefix: Prefix for image filenames
         """
         self.output_dir = output_dir
+        # Output path prefix ending in a separator; filenames are appended
+        # directly instead of going through os.path.join per image
+        self._dir_prefix = os.path.join(output_dir, '')
         self.tracker = progress_tracker
         self.prefix = prefix
 
-        # Local stats for current batch
-        self.batch_stats = {
-            'saved': 0,
-            'duplicates': 0,
-            'errors': 0,
-        }
+        # Local stats for current batch, indexed by the STAT_* constants
+        self._batch_stats = [0, 0, 0, 0]
+
+        # URLs already attempted in this run, across all batches
+        self._seen_urls: set[str] = set()
+
+        # Shared session so connections are kept alive and reused across images
+        self.session = requests.Session()
+        self.session.headers['Accept'] = 'image/*'
+        # Retry-After is ignored: an image host could otherwise stall the
+        # batch for as long as it likes, outside DOWNLOAD_TIMEOUT
+        adapter = HTTPAdapter(
+            pool_connections=DOWNLOAD_POOL_SIZE,
+            pool_maxsize=DOWNLOAD_POOL_SIZE,
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.3,
+                status_forcelist=[502, 503, 504],
+                respect_retry_after_header=False,
+            ),
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
 
-    def download_image(self, url: str) -> tuple[bytes, str] | None:
+    def download_image(self, url: str) -> tuple[str, bytes, str] | None:
         """
-        Download image from URL.
+        Stream image from URL into a temporary file, hashing it on the way.
+
+        The body is read in chunks that are written to disk and fed to the
+        hasher in the same pass, so the full image is never held in memory.
+        Responses whose Content-Type is clearly not an image are rejected
+        from the headers alone, before any of the body is read.
 
         Args:
             url: Image URL to download
 
         Returns:
-            Tuple of (content bytes, content type) or None on failure
+            Tuple of (temp file path, SHA-256 digest, content type) or None on failure
         """
+        temp_path = None
         try:
-            response = requests.get(url, timeout=30, stream=True)
-            response.raise_for_status()
+            with self.session.get(url, timeout=DOWNLOAD_TIMEOUT, stream=True) as response:
+                response.raise_for_status()
+
+                content_type = response.headers.get('Content-Type', '')
+                if not is_image_content_type(content_type):
+                    return None
+
+                hasher = hashlib.sha256()
 
-            content_type = response.headers.get('Content-Type', '')
-            content = response.content
+                fd, temp_path = tempfile.mkstemp(
+                    prefix=f".{self.prefix}_", suffix='.part', dir=self.output_dir
+                )
+                os.chmod(temp_path, IMAGE_FILE_MODE)
+                with open(fd, 'wb', buffering=DOWNLOAD_WRITE_BUFFER) as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        hasher.update(chunk)
+                        f.write(chunk)
 
-            return content, content_type
+            return temp_path, hasher.digest(), content_type
 
-        except requests.exceptions.RequestException:
+        except (requests.exceptions.RequestException, OSError):
+            if temp_path is not None:
+                self._discard_temp(temp_path)
             return None
 
-    def save_image(self, content: bytes, url: str, content_type: str) -> str | None:
+    def save_image(self, temp_path: str, content_hash: bytes, url: str, content_type: str) -> str | None:
         """
-        Save image to disk with proper naming.
+        Move a downloaded image to its final name, or drop it if duplicate.
 
         Args:
-            content: Image bytes
+            temp_path: Temporary file written by download_image
+            content_hash: SHA-256 digest of the downloaded content
             url: Source URL (for filename)
             content_type: Content-Type header
 
         Returns:
             Saved filename or None if duplicate/error
         """
-        # Compute hash for deduplication
-        content_hash = compute_hash(content)
-
         # Check for duplicate (using tracker's persistent hash set)
         if self.tracker.is_hash_seen(content_hash):
-            self.batch_stats['duplicates'] += 1
+            self._discard_temp(temp_path)
+            self.tracker.add_url(url, content_hash)
+            self._batch_stats[self.STAT_DUPLICATES] += 1
             self.tracker.increment_duplicates()
             return None
 
@@ -89,86 +156,185 @@ class ImageDownloader:
         sanitized_url = sanitize_filename(url)
         filename = f"{self.prefix}_{counter:03d}_scraped_from_{sanitized_url}{extension}"
 
-        # Save to disk
-        filepath = os.path.join(self.output_dir, filename)
+        # Move into place
+        filepath = self._dir_prefix + filename
         try:
-            with open(filepath, 'wb') as f:
-                f.write(content)
-            self.batch_stats['saved'] += 1
+            os.replace(temp_path, filepath)
+            self.tracker.add_url(url, content_hash)
+            self._batch_stats[self.STAT_SAVED] += 1
             self.tracker.increment_saved()
             return filename
-        except IOError:
-            self.batch_stats['errors'] += 1
+        except OSError:
+            self._discard_temp(temp_path)
+            self._batch_stats[self.STAT_ERRORS] += 1
             self.tracker.increment_errors()
             return None
 
-    def process_image(self, image_data: dict) -> bool:
+    @staticmethod
+    def _discard_temp(temp_path: str):
+        """Remove a temporary download file, ignoring missing files."""
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    def process_image(self, url: str) -> bool:
         """
         Process a single image: download, deduplicate, save.
 
         Args:
-            image_data: Dict with 'url' and 'source' keys
+            url: Image URL
 
         Returns:
             True if image was saved, False otherwise
         """
-        url = image_data.get('url')
+        if self._skip_known_url(url):
+            return False
+
+        return self._persist(self._download_only(url))
+
+    def _skip_known_url(self, url: str) -> bool:
+        """
+        Skip an image without fetching it if its URL was already downloaded
+        (counted as a duplicate), or already attempted in this run by an
+        earlier batch or earlier in the same batch (counted as skipped: a
+        failed attempt says nothing about the content).
+
+        Returns:
+            True if the image should be skipped
+        """
         if not url:
-            self.batch_stats['errors'] += 1
-            self.tracker.increment_errors()
             return False
 
-        # Download
+        if self.tracker.is_url_seen(url):
+            self._batch_stats[self.STAT_DUPLICATES] += 1
+            self.tracker.increment_duplicates()
+            return True
+
+        if url in self._seen_urls:
+            self._batch_stats[self.STAT_SKIPPED] += 1
+            self.tracker.increment_repeats()
+            return True
+
+        self._seen_urls.add(url)
+        return False
+
+    def _download_only(self, url: str) -> tuple[str, str, bytes, str] | None:
+        """
+        Network half of process_image; safe to run on worker threads.
+
+        Returns:
+            Tuple of (url, temp file path, content hash, content type) or None on failure
+        """
+        if not url:
+            return None
+
         result = self.download_image(url)
         if result is None:
-            self.batch_stats['errors'] += 1
+            return None
+
+        return (url, *result)
+
+    def _persist(self, result: tuple[str, str, bytes, str] | None) -> bool:
+        """
+        Dedup/save half of process_image; runs on the calling thread only,
+        so the tracker is never touched concurrently.
+
+        Returns:
+            True if image was saved, False otherwise
+        """
+        if result is None:
+            self._batch_stats[self.STAT_ERRORS] += 1
             self.tracker.increment_errors()
             return False
 
-        content, content_type = result
+        url, temp_path, content_hash, content_type = result
 
         # Save (with deduplication)
-        filename = self.save_image(content, url, content_type)
+        filename = self.save_image(temp_path, content_hash, url, content_type)
         return filename is not None
 
-    def process_all(self, images: list[dict], show_progress: bool = True) -> dict:
+    def _discard_download(self, future: Future):
+        """Remove the temp file of a download that will never be persisted."""
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        if result is not None:
+            self._discard_temp(result[1])
+
+    def process_all(self, urls: list[str], show_progress: bool = True) -> dict:
         """
         Process all images with progress display.
 
+        Images whose URL was already downloaded are skipped without a
+        request. The rest download concurrently on a thread pool; results are
+        deduplicated and saved on the calling thread as they complete.
+
         Args:
-            images: List of image metadata dicts
+            urls: Image URLs, e.g. SearchResults.urls
             show_progress: Whether to show progress bar
 
         Returns:
             Batch statistics dict
         """
-        total = len(images)
+        total = len(urls)
 
         if total == 0:
-            return self.batch_stats.copy()
+            return self.get_batch_stats()
+
+        pending = [url for url in urls if not self._skip_known_url(url)]
+        if not pending:
+            return self.get_batch_stats()
 
-        for i, image_data in enumerate(images, 1):
-            self.process_image(image_data)
+        executor = ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(pending)))
+        futures = [executor.submit(self._download_only, url) for url in pending]
 
-            if show_progress:
-                # Simple progress indicator
-                progress = int((i / total) * 40)
-                bar = '█' * progress + '░' * (40 - progress)
-                print(f"\r  Downloading: [{bar}] {i}/{total}", end='', flush=True)
+        last_draw = 0.0
+        last_progress = -1
+
+        try:
+            for i, future in enumerate(as_completed(futures), total - len(pending) + 1):
+                self._persist(future.result())
+
+                if show_progress:
+                    # Simple progress indicator, redrawn at most every
+                    # PROGRESS_REDRAW_INTERVAL seconds (always on the last image)
+                    progress = int((i / total) * 40)
+                    now = time.monotonic()
+                    if i == total or (
+                        progress != last_progress
+                        and now - last_draw >= PROGRESS_REDRAW_INTERVAL
+                    ):
+                        bar = '█' * progress + '░' * (40 - progress)
+                        print(f"\r  Downloading: [{bar}] {i}/{total}", end='', flush=True)
+                        last_draw = now
+                        last_progress = progress
+        except BaseException:
+            # Interrupted: clean up temp files of downloads still in flight
+            for future in futures:
+                future.add_done_callback(self._discard_download)
+            raise
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
         if show_progress:
             print()  # New line after progress bar
 
-        return self.batch_stats.copy()
+        return self.get_batch_stats()
 
     def reset_batch_stats(self):
         """Reset batch statistics for new batch."""
-        self.batch_stats = {
-            'saved': 0,
-            'duplicates': 0,
-            'errors': 0,
-        }
+        self._batch_stats = [0, 0, 0, 0]
 
     def get_batch_stats(self) -> dict:
         """Get current batch statistics."""
-        return self.batch_stats.copy()
+        return {
+            'saved': self._batch_stats[self.STAT_SAVED],
+            'duplicates': self._batch_stats[self.STAT_DUPLICATES],
+            'errors': self._batch_stats[self.STAT_ERRORS],
+            'skipped': self._batch_stats[self.STAT_SKIPPED],
+        }
+
+    def close(self):
+        """Close the HTTP session and its pooled connections."""
+        self.session.close()
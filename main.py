@@ -6,14 +6,16 @@ with automatic deduplication, multi-key rotation, and resume support.
 """
 
 import argparse
+import logging
 import sys
-import os
-from config import validate_config, DEFAULT_OUTPUT_DIR, DEFAULT_COUNT, DEFAULT_QUERIES_FILE, USE_DATE_FILTERS, USE_SIZE_FILTERS
+from logging.handlers import RotatingFileHandler
+from config import validate_config, DEFAULT_OUTPUT_DIR, DEFAULT_COUNT, DEFAULT_QUERIES_FILE, USE_DATE_FILTERS, USE_SIZE_FILTERS, LOG_FILE
 from utils import read_queries_from_file
 from api_manager import APIManager
 from progress_tracker import ProgressTracker
 from searcher import (
-    search_images,
+    search_many,
+    prune_cache,
     generate_filter_combinations,
     format_filter_display,
     AllKeysExhaustedError
@@ -88,6 +90,29 @@ Examples:
     return parser.parse_args()
 
 
+def setup_logging():
+    """
+    Send the scraper's log records to the console (plain) and a rotating
+    log file (timestamped).
+
+    Only the searcher logger is configured; the root logger is left alone so
+    library records (e.g. urllib3 retries) stay silent as before.
+    """
+    console = logging.StreamHandler(sys.stdout)
+    # Records can arrive from search threads while a progress bar is being
+    # drawn, so each one starts on a fresh line
+    console.setFormatter(logging.Formatter('\n%(message)s'))
+
+    log_file = RotatingFileHandler(LOG_FILE, maxBytes=1024 * 1024, backupCount=3, encoding='utf-8')
+    log_file.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    logger = logging.getLogger('searcher')
+    logger.setLevel(logging.INFO)
+    logger.addHandler(console)
+    logger.addHandler(log_file)
+    logger.propagate = False
+
+
 def print_header(text: str):
     """Print a section header."""
     print("\n" + "=" * 60)
@@ -118,6 +143,7 @@ def print_completion_info(tracker: ProgressTracker):
 def main():
     """Main entry point."""
     args = parse_args()
+    setup_logging()
 
     # Validate configuration and get credentials
     print("Validating configuration...")
@@ -178,9 +204,8 @@ def main():
 
     # Handle fresh start or resume
     if args.fresh:
-        # Delete existing progress file
-        if os.path.exists(tracker.progress_file):
-            os.remove(tracker.progress_file)
+        # Delete existing progress file and hash log
+        tracker.delete_saved_progress()
         print("Starting fresh (--fresh flag used)")
         is_resuming = False
     else:
@@ -198,22 +223,44 @@ def main():
         tracker = ProgressTracker()
         tracker.set_session_info(args.queries, len(queries), total_combinations)
 
+    # Flush progress on exit or SIGTERM, between periodic saves
+    tracker.register_exit_handlers()
+
     # Clamp count to valid range
     count = min(max(1, args.count), 100)
 
     # Initialize downloader with tracker
     downloader = ImageDownloader(args.output, tracker, prefix=args.prefix)
 
+    # Drop expired search responses left by earlier runs
+    prune_cache()
+
     # Main processing loop
     print_header("PROCESSING")
 
     all_keys_exhausted = False
     filter_counter = 0
 
+    # Precompute per-filter labels and loop bounds once
+    filter_display = [format_filter_display(f) for f in filter_combinations]
+    num_queries = len(queries)
+    num_filters = len(filter_combinations)
+
+    # One search pipeline across all queries: pending combinations are
+    # searched a few ahead while earlier ones download, and consumed below
+    # in (query, filter) order
+    pending_jobs = (
+        (query, filters)
+        for query_idx, query in enumerate(queries)
+        for filter_idx, filters in enumerate(filter_combinations)
+        if not tracker.is_combination_done(query_idx, filter_idx)
+    )
+    search_results = search_many(pending_jobs, api_manager, count)
+
     try:
         for query_idx, query in enumerate(queries):
             print(f"\n{'─' * 60}")
-            print(f"[Query {query_idx + 1}/{len(queries)}] \"{query}\"")
+            print(f"[Query {query_idx + 1}/{num_queries}] \"{query}\"")
             print(f"{'─' * 60}")
 
             for filter_idx, filters in enumerate(filter_combinations):
@@ -221,19 +268,18 @@ def main():
 
                 # Skip if already completed
                 if tracker.is_combination_done(query_idx, filter_idx):
-                    print(f"\n[Filter {filter_idx + 1}/{len(filter_combinations)}] {format_filter_display(filters)}")
+                    print(f"\n[Filter {filter_idx + 1}/{num_filters}] {filter_display[filter_idx]}")
                     print("  Skipped (already completed)")
                     continue
 
                 # Update position
                 tracker.update_position(query_idx, filter_idx)
 
-                print(f"\n[Filter {filter_idx + 1}/{len(filter_combinations)}] {format_filter_display(filters)}")
-                print(f"  Using API Key #{api_manager.get_current_key_number()}")
+                print(f"\n[Filter {filter_idx + 1}/{num_filters}] {filter_display[filter_idx]}")
 
                 # Search for images
                 try:
-                    images = search_images(query, api_manager, filters, count)
+                    images = next(search_results)
                 except AllKeysExhaustedError:
                     print("\n[!] All API keys exhausted!")
                     all_keys_exhausted = True
@@ -243,7 +289,7 @@ def main():
                 if images is None:
                     print("  Skipping due to error (will retry on next run)")
                     tracker.increment_errors()
-                    tracker.save()
+                    tracker.maybe_save()
                     continue
 
                 # Handle no results found (empty list = success but no results)
@@ -251,20 +297,20 @@ def main():
                     print("  No images found for this combination")
                     tracker.add_no_results(query_idx, filter_idx, query, filters)
                     tracker.mark_combination_complete(query_idx, filter_idx)
-                    tracker.save()
+                    tracker.maybe_save()
                     continue
 
                 print(f"  Found: {len(images)} images")
 
                 # Download images
                 downloader.reset_batch_stats()
-                batch_stats = downloader.process_all(images)
+                batch_stats = downloader.process_all(images.urls)
 
-                print(f"  Saved: {batch_stats['saved']} | Duplicates: {batch_stats['duplicates']} | Errors: {batch_stats['errors']}")
+                print(f"  Saved: {batch_stats['saved']} | Duplicates: {batch_stats['duplicates']} | Errors: {batch_stats['errors']} | Skipped: {batch_stats['skipped']}")
 
-                # Mark as complete and save progress
+                # Mark as complete and save progress (coalesced)
                 tracker.mark_combination_complete(query_idx, filter_idx)
-                tracker.save()
+                tracker.maybe_save()
 
             if all_keys_exhausted:
                 break
@@ -274,10 +320,15 @@ def main():
         print("[!] Saving progress...")
         tracker.save()
 
+    search_results.close()
+    downloader.close()
+    tracker.close()
+
     # Final summary
     stats = tracker.get_stats()
 
     if all_keys_exhausted:
+        tracker.save()
         print_header("PAUSED - QUOTA EXHAUSTED")
         print(f"  Progress saved: Query {tracker.query_index + 1}, Filter {tracker.filter_index + 1}")
         print(f"  Combinations completed: {len(tracker.completed)}/{total_combinations}")
@@ -293,6 +344,7 @@ def main():
     print(f"  Completed: {len(tracker.completed)}")
     print(f"  Unique images saved: {stats['images_saved']}")
     print(f"  Duplicates skipped: {stats['duplicates_skipped']}")
+    print(f"  Repeated URLs skipped: {stats['repeats_skipped']}")
     print(f"  No results found: {stats['no_results']}")
     print(f"  Errors: {stats['errors']}")
     print(f"  API keys used: {api_manager.get_status()['exhausted_count'] + 1} of {api_manager.get_total_keys()}")
@@ -1,22 +1,72 @@
 """Progress tracking and checkpoint/resume system."""
 
-import json
+import atexit
+import base64
 import os
+import signal
+import sys
+import time
 from datetime import datetime
-from config import PROGRESS_FILE
+import orjson
+from config import PROGRESS_FILE, HASH_LOG_FILE, URL_LOG_FILE, SAVE_INTERVAL
+
+# Bits reserved for filter_index in packed combination keys
+COMBINATION_KEY_BITS = 32
+COMBINATION_KEY_MASK = (1 << COMBINATION_KEY_BITS) - 1
+
+# Size of a raw SHA-256 digest as stored in the logs
+HASH_SIZE = 32
+
+
+def _decode_hash(encoded: str) -> bytes | None:
+    """Decode a base64 log entry, or return None if it is torn or malformed."""
+    try:
+        hash_value = base64.b64decode(encoded, validate=True)
+    except ValueError:  # binascii.Error, or non-ASCII text
+        return None
+    return hash_value if len(hash_value) == HASH_SIZE else None
+
+
+def _open_log(path: str):
+    """
+    Open an append-only log, line buffered so each entry reaches disk at once.
+
+    If a crash left the last entry without its newline, the next entry is
+    started on a fresh line instead of being glued onto the torn one.
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b'\n'
+    except OSError:
+        torn = False  # Missing or empty
+
+    log = open(path, 'a', encoding='utf-8', buffering=1)
+    if torn:
+        log.write('\n')
+    return log
 
 
 class ProgressTracker:
     """Tracks progress and enables resume from checkpoint."""
 
-    def __init__(self, progress_file: str = PROGRESS_FILE):
+    def __init__(
+        self,
+        progress_file: str = PROGRESS_FILE,
+        hash_log_file: str = HASH_LOG_FILE,
+        url_log_file: str = URL_LOG_FILE
+    ):
         """
         Initialize the progress tracker.
 
         Args:
             progress_file: Path to the progress JSON file
+            hash_log_file: Path to the append-only log of seen hashes
+            url_log_file: Path to the append-only TSV of downloaded URLs
         """
         self.progress_file = progress_file
+        self.hash_log_file = hash_log_file
+        self.url_log_file = url_log_file
         self.status = "in_progress"
         self.started_at = None
         self.updated_at = None
@@ -28,13 +78,15 @@ class ProgressTracker:
         self.query_index = 0
         self.filter_index = 0
 
-        # Completed combinations: set of (query_index, filter_index) tuples
-        self.completed = set()
+        # Completed combinations: set of (query_index, filter_index) pairs
+        # packed into single ints by _combination_key
+        self.completed: set[int] = set()
 
         # Statistics
         self.stats = {
             'images_saved': 0,
             'duplicates_skipped': 0,
+            'repeats_skipped': 0,
             'no_results': 0,
             'errors': 0,
         }
@@ -42,12 +94,26 @@ class ProgressTracker:
         # Track combinations that returned no results
         self.no_results_list = []
 
-        # Deduplication hashes (persisted across runs)
-        self.seen_hashes = set()
+        # Deduplication hashes as raw SHA-256 digests (persisted across runs
+        # in the hash log, one base64 line per hash, so adding a hash never
+        # rewrites the whole set)
+        self.seen_hashes: set[bytes] = set()
+        self._hash_log = None
+
+        # URLs already downloaded, mapped to the digest of their content
+        # (persisted in the URL log) so known URLs are never fetched again
+        self.url_to_hash: dict[str, bytes] = {}
+        self._url_log = None
 
         # Image counter (persisted across runs)
         self.image_counter = 0
 
+        # Whether in-memory state differs from the progress file
+        self._dirty = False
+
+        # Monotonic time of the last write, for maybe_save
+        self._last_save = 0.0
+
     def load(self) -> bool:
         """
         Load progress from file.
@@ -56,15 +122,17 @@ class ProgressTracker:
             True if resuming from previous session, False if starting fresh
         """
         if not os.path.exists(self.progress_file):
+            self._discard_logs()
             self.started_at = datetime.now().isoformat()
             return False
 
         try:
-            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(self.progress_file, 'rb') as f:
+                data = orjson.loads(f.read())
 
             # Check if previous session was completed
             if data.get('status') == 'completed':
+                self._discard_logs()
                 self.started_at = datetime.now().isoformat()
                 return False
 
@@ -81,41 +149,112 @@ class ProgressTracker:
             self.query_index = position.get('query_index', 0)
             self.filter_index = position.get('filter_index', 0)
 
-            # Load completed combinations
-            completed_list = data.get('completed', [])
-            self.completed = set(
-                (item['query_index'], item['filter_index'])
-                for item in completed_list
-            )
+            # Load completed combinations ([query_index, filter_index] pairs;
+            # older progress files stored them as dicts)
+            self.completed = set()
+            for item in data.get('completed', []):
+                if isinstance(item, dict):
+                    query_index, filter_index = item['query_index'], item['filter_index']
+                else:
+                    query_index, filter_index = item
+                self.completed.add(self._combination_key(query_index, filter_index))
 
             # Load stats
             self.stats = data.get('stats', {
                 'images_saved': 0,
                 'duplicates_skipped': 0,
+                'repeats_skipped': 0,
                 'no_results': 0,
                 'errors': 0,
             })
-            # Ensure no_results key exists for older progress files
-            if 'no_results' not in self.stats:
-                self.stats['no_results'] = 0
+            # Ensure keys added later exist for older progress files
+            self.stats.setdefault('no_results', 0)
+            self.stats.setdefault('repeats_skipped', 0)
 
             # Load no results list
             self.no_results_list = data.get('no_results_list', [])
 
-            # Load hashes for deduplication
-            self.seen_hashes = set(data.get('seen_hashes', []))
+            # Load hashes and known URLs for deduplication
+            self._load_hash_log()
+            self._load_url_log()
+
+            # Migrate hashes stored inline by older progress files
+            for hex_hash in data.get('seen_hashes', []):
+                hash_value = bytes.fromhex(hex_hash)
+                if hash_value not in self.seen_hashes:
+                    self.add_hash(hash_value)
 
             # Load image counter
             self.image_counter = data.get('image_counter', 0)
 
             return True
 
-        except (json.JSONDecodeError, IOError):
+        except (orjson.JSONDecodeError, IOError):
+            self.seen_hashes = set()
+            self.url_to_hash = {}
+            self._discard_logs()
             self.started_at = datetime.now().isoformat()
             return False
 
+    def _load_hash_log(self):
+        """Read previously seen hashes from the hash log."""
+        self.seen_hashes = set()
+        if not os.path.exists(self.hash_log_file):
+            return
+
+        with open(self.hash_log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                # Skips blank lines and a torn last line left by a crash
+                hash_value = _decode_hash(line.strip())
+                if hash_value is not None:
+                    self.seen_hashes.add(hash_value)
+
+    def _load_url_log(self):
+        """Read previously downloaded URLs from the URL log."""
+        self.url_to_hash = {}
+        if not os.path.exists(self.url_log_file):
+            return
+
+        with open(self.url_log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                url, _, encoded_hash = line.rstrip('\n').rpartition('\t')
+                hash_value = _decode_hash(encoded_hash)
+                if url and hash_value is not None:
+                    self.url_to_hash[url] = hash_value
+
+    def _discard_logs(self):
+        """Delete the hash and URL logs so a fresh session starts without old entries."""
+        self.close()
+        for log_file in (self.hash_log_file, self.url_log_file):
+            if os.path.exists(log_file):
+                os.remove(log_file)
+
+    def delete_saved_progress(self):
+        """Delete the progress file and logs (used by --fresh)."""
+        if os.path.exists(self.progress_file):
+            os.remove(self.progress_file)
+        self._discard_logs()
+
+    def close(self):
+        """Close the hash and URL log files."""
+        if self._hash_log is not None:
+            self._hash_log.close()
+            self._hash_log = None
+        if self._url_log is not None:
+            self._url_log.close()
+            self._url_log = None
+
     def save(self):
-        """Save current progress to file."""
+        """
+        Save current progress to file.
+
+        Does nothing if no state changed since the last save. The file is
+        written to a temporary path and renamed over the old one, so an
+        interrupted save never leaves a truncated progress file.
+        """
+        if not self._dirty:
+            return
+
         self.updated_at = datetime.now().isoformat()
 
         data = {
@@ -130,70 +269,131 @@ class ProgressTracker:
                 'filter_index': self.filter_index,
             },
             'completed': [
-                {'query_index': q, 'filter_index': f}
-                for q, f in sorted(self.completed)
+                (key >> COMBINATION_KEY_BITS, key & COMBINATION_KEY_MASK)
+                for key in self.completed
             ],
             'stats': self.stats,
             'no_results_list': self.no_results_list,
-            'seen_hashes': list(self.seen_hashes),
             'image_counter': self.image_counter,
         }
 
-        with open(self.progress_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        temp_file = self.progress_file + '.tmp'
+        with open(temp_file, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        os.replace(temp_file, self.progress_file)
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def register_exit_handlers(self):
+        """
+        Guarantee a final save when the process exits.
+
+        Registers save() with atexit and turns SIGTERM into a clean exit,
+        so coalesced progress is flushed even when the run is stopped
+        between two periodic saves.
+        """
+        atexit.register(self.save)
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
+
+    def _handle_sigterm(self, signum, frame):
+        """Save progress and exit on SIGTERM."""
+        self.save()
+        sys.exit(0)
+
+    def maybe_save(self):
+        """Save progress if at least SAVE_INTERVAL seconds passed since the last save."""
+        if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+            self.save()
 
     def set_session_info(self, queries_file: str, total_queries: int, total_combinations: int):
         """Set session information."""
+        self._dirty = True
         self.queries_file = queries_file
         self.total_queries = total_queries
         self.total_combinations = total_combinations
 
     def update_position(self, query_index: int, filter_index: int):
         """Update current position."""
+        self._dirty = True
         self.query_index = query_index
         self.filter_index = filter_index
 
     def mark_combination_complete(self, query_index: int, filter_index: int):
         """Mark a combination as completed."""
-        self.completed.add((query_index, filter_index))
+        self._dirty = True
+        self.completed.add(self._combination_key(query_index, filter_index))
         self.update_position(query_index, filter_index)
 
     def is_combination_done(self, query_index: int, filter_index: int) -> bool:
         """Check if a combination was already processed."""
-        return (query_index, filter_index) in self.completed
+        return self._combination_key(query_index, filter_index) in self.completed
+
+    @staticmethod
+    def _combination_key(query_index: int, filter_index: int) -> int:
+        """Pack a (query_index, filter_index) pair into one int."""
+        return (query_index << COMBINATION_KEY_BITS) | filter_index
 
     def mark_finished(self):
         """Mark the entire session as completed."""
+        self._dirty = True
         self.status = 'completed'
         self.save()
 
-    def add_hash(self, hash_value: str):
-        """Add a hash to the seen set."""
+    def add_hash(self, hash_value: bytes):
+        """Add a hash to the seen set and append it to the hash log."""
+        self._dirty = True
         self.seen_hashes.add(hash_value)
+        if self._hash_log is None:
+            self._hash_log = _open_log(self.hash_log_file)
+        self._hash_log.write(base64.b64encode(hash_value).decode('ascii') + '\n')
 
-    def is_hash_seen(self, hash_value: str) -> bool:
+    def is_hash_seen(self, hash_value: bytes) -> bool:
         """Check if a hash was already seen."""
         return hash_value in self.seen_hashes
 
+    def add_url(self, url: str, hash_value: bytes):
+        """Record the content hash a URL resolved to and append it to the URL log."""
+        if url in self.url_to_hash or '\t' in url or '\n' in url:
+            return
+
+        self.url_to_hash[url] = hash_value
+        if self._url_log is None:
+            self._url_log = _open_log(self.url_log_file)
+        self._url_log.write(f"{url}\t{base64.b64encode(hash_value).decode('ascii')}\n")
+
+    def is_url_seen(self, url: str) -> bool:
+        """Check if a URL was already downloaded."""
+        return url in self.url_to_hash
+
     def increment_counter(self) -> int:
         """Increment and return the next image number."""
+        self._dirty = True
         self.image_counter += 1
         return self.image_counter
 
     def increment_saved(self):
         """Increment saved images count."""
+        self._dirty = True
         self.stats['images_saved'] += 1
 
     def increment_duplicates(self):
         """Increment duplicates count."""
+        self._dirty = True
         self.stats['duplicates_skipped'] += 1
 
+    def increment_repeats(self):
+        """Increment count of repeated URLs skipped without a download."""
+        self._dirty = True
+        self.stats['repeats_skipped'] += 1
+
     def increment_errors(self):
         """Increment errors count."""
+        self._dirty = True
         self.stats['errors'] += 1
 
     def add_no_results(self, query_idx: int, filter_idx: int, query: str, filters: dict):
         """Record a combination that returned no results."""
+        self._dirty = True
         self.stats['no_results'] += 1
         self.no_results_list.append({
             'query_index': query_idx,
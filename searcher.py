@@ -1,9 +1,70 @@
 """Google Custom Search API integration for image search."""
 
+import hashlib
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import orjson
 import requests
-from config import BASE_URL, RESULTS_PER_PAGE, MAX_RESULTS_PER_QUERY, DATE_FILTERS, SIZE_FILTERS
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import (
+    BASE_URL,
+    RESULTS_PER_PAGE,
+    MAX_RESULTS_PER_QUERY,
+    DATE_FILTERS,
+    SIZE_FILTERS,
+    SEARCH_WORKERS,
+    SEARCH_LOOKAHEAD,
+    SEARCH_PAGE_WAVE,
+    SEARCH_POOL_SIZE,
+    SEARCH_FIELDS,
+    SEARCH_MAX_RETRIES,
+    BACKOFF_BASE,
+    BACKOFF_CAP,
+    RATE_LIMIT_ROTATE_STREAK,
+    CACHE_DIR,
+    CACHE_TTL,
+)
 from api_manager import APIManager
 
+logger = logging.getLogger(__name__)
+
+# 403 error reasons that mean the key's quota is used up
+_QUOTA_REASONS = frozenset({'dailyLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded'})
+
+
+class _ServerErrorRetry(Retry):
+    """Retry that never acts on a 429's Retry-After; _fetch_page handles 429s."""
+
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
+
+
+# Shared session: keeps connections to the API alive across pages and
+# queries, and retries connection errors and 5xx responses in place.
+# 429/403 are left to _fetch_page, which can switch API keys.
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=SEARCH_POOL_SIZE,
+    pool_maxsize=SEARCH_POOL_SIZE,
+    max_retries=_ServerErrorRetry(
+        total=SEARCH_MAX_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
 
 class QuotaExhaustedError(Exception):
     """Raised when API quota is exhausted."""
@@ -45,40 +106,132 @@ def generate_filter_combinations(
     return combinations
 
 
-def search_images(
+def _backoff_delay(previous: float, response: requests.Response) -> float:
+    """
+    Compute the next retry delay using decorrelated jitter.
+
+    A numeric Retry-After header from the server takes precedence.
+
+    Args:
+        previous: The previous delay in seconds
+        response: The response that triggered the retry
+
+    Returns:
+        Delay in seconds, capped at BACKOFF_CAP
+    """
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return min(BACKOFF_CAP, max(0.0, float(retry_after)))
+        except ValueError:
+            pass  # HTTP-date form; fall back to jitter
+
+    return min(BACKOFF_CAP, random.uniform(BACKOFF_BASE, previous * 3))
+
+
+def _cache_path(query: str, filters: dict, start_index: int, num_to_fetch: int, cx: str) -> str:
+    """Path of the cache file for one results page (API key excluded)."""
+    key_data = orjson.dumps(
+        [query, filters, start_index, num_to_fetch, cx],
+        option=orjson.OPT_SORT_KEYS
+    )
+    key = hashlib.blake2b(key_data, digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, key + '.json')
+
+
+def _load_cached_page(path: str) -> dict | None:
+    """
+    Return a cached page if present and younger than CACHE_TTL, else None.
+
+    Expired pages are deleted when read so they only stay on disk until
+    their key is next looked up; prune_cache removes the rest.
+    """
+    try:
+        if time.time() - os.path.getmtime(path) > CACHE_TTL:
+            os.remove(path)
+            return None
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+
+def _store_cached_page(path: str, data: dict):
+    """Write a page to the cache atomically; failures are ignored."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        with open(fd, 'wb') as f:
+            f.write(orjson.dumps(data))
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+
+def prune_cache():
+    """Delete cached pages (and stray temp files) older than CACHE_TTL."""
+    cutoff = time.time() - CACHE_TTL
+    try:
+        entries = list(os.scandir(CACHE_DIR))
+    except OSError:
+        return  # No cache yet
+
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _fetch_page(
     query: str,
     api_manager: APIManager,
-    filters: dict = None,
-    count: int = 100
-) -> list[dict] | None:
+    filters: dict,
+    start_index: int,
+    num_to_fetch: int
+) -> dict:
     """
-    Search for images using Google Custom Search API.
+    Fetch one page of search results, rotating API keys on quota errors.
+
+    Pages are served from the on-disk cache (CACHE_DIR) when a response
+    for the same query, filters and offset is younger than CACHE_TTL.
+
+    Requests are paced per key by APIManager.throttle. A 429 is first
+    retried on the same key after a jittered backoff; the key is only
+    rotated out after RATE_LIMIT_ROTATE_STREAK consecutive 429s.
+    Connection errors and 5xx responses are retried by the session itself.
+
+    Safe to call from several threads at once for different pages.
 
     Args:
         query: The search query string
         api_manager: APIManager instance for credentials
         filters: Dict with optional 'dateRestrict' and 'imgSize' keys
-        count: Number of images to fetch (max 100)
+        start_index: 1-based index of the first result on the page
+        num_to_fetch: Number of results to request (max 10)
 
     Returns:
-        - List of image results if successful (can be empty if no results found)
-        - None if network/API error occurred (allows retry on next run)
+        Parsed JSON response
 
     Raises:
         AllKeysExhaustedError: When all API keys are exhausted
+        requests.exceptions.RequestException: On network/HTTP errors
+        ValueError: When the response is not valid JSON
     """
-    count = min(count, MAX_RESULTS_PER_QUERY)
-    filters = filters or {}
-
-    results = []
-    start_index = 1
+    delay = BACKOFF_BASE
 
-    while len(results) < count:
+    while True:
         if not api_manager.has_available_keys():
             raise AllKeysExhaustedError("All API keys have been exhausted")
 
-        api_key, cx = api_manager.get_current_credentials()
-        num_to_fetch = min(RESULTS_PER_PAGE, count - len(results))
+        key_index = api_manager.current_index
+        api_key, cx = api_manager.credentials[key_index]
+
+        cache_path = _cache_path(query, filters, start_index, num_to_fetch, cx)
+        cached = _load_cached_page(cache_path)
+        if cached is not None:
+            return cached
 
         params = {
             'key': api_key,
@@ -87,6 +240,7 @@ def search_images(
             'searchType': 'image',
             'start': start_index,
             'num': num_to_fetch,
+            'fields': SEARCH_FIELDS,
         }
 
         # Add optional filters
@@ -95,62 +249,215 @@ def search_images(
         if 'imgSize' in filters:
             params['imgSize'] = filters['imgSize']
 
-        try:
-            response = requests.get(BASE_URL, params=params, timeout=30)
-
-            # Check for quota exceeded (429 or specific error)
-            if response.status_code == 429:
-                print(f"\n  [!] API Key #{api_manager.get_current_key_number()} quota exceeded.")
-                if api_manager.rotate_to_next():
-                    print(f"  [>] Rotating to API Key #{api_manager.get_current_key_number()}...")
-                    continue  # Retry with new key
-                else:
-                    raise AllKeysExhaustedError("All API keys have been exhausted")
-
-            # Check for other quota-related errors in response
-            if response.status_code == 403:
-                try:
-                    error_data = response.json()
-                    error_reason = error_data.get('error', {}).get('errors', [{}])[0].get('reason', '')
-                    if error_reason in ['dailyLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded']:
-                        print(f"\n  [!] API Key #{api_manager.get_current_key_number()} quota exceeded ({error_reason}).")
-                        if api_manager.rotate_to_next():
-                            print(f"  [>] Rotating to API Key #{api_manager.get_current_key_number()}...")
-                            continue
-                        else:
-                            raise AllKeysExhaustedError("All API keys have been exhausted")
-                except (ValueError, KeyError):
-                    pass
-
-            response.raise_for_status()
-            data = response.json()
-
-            items = data.get('items', [])
-            if not items:
-                break
-
-            for item in items:
-                results.append({
-                    'url': item.get('link'),
-                    'source': item.get('image', {}).get('contextLink', ''),
-                    'title': item.get('title', ''),
-                })
-
-            start_index += RESULTS_PER_PAGE
-
-            if start_index > MAX_RESULTS_PER_QUERY:
-                break
-
-        except requests.exceptions.RequestException as e:
-            print(f"  API request failed: {e}")
-            return None  # Return None to indicate network error (can retry)
-        except ValueError as e:
-            print(f"  Failed to parse API response: {e}")
-            return None  # Return None to indicate error (can retry)
+        api_manager.throttle(key_index)
+        response = _session.get(BASE_URL, params=params, timeout=30)
+
+        # Rate limited: back off first, rotate only if the key keeps failing
+        if response.status_code == 429:
+            if api_manager.current_index != key_index:
+                continue  # Another search already rotated away from this key
+
+            streak = api_manager.record_rate_limited(key_index)
+            if streak < RATE_LIMIT_ROTATE_STREAK:
+                delay = _backoff_delay(delay, response)
+                logger.warning("  [~] API Key #%d rate limited, retrying in %.1fs...", key_index + 1, delay)
+                time.sleep(delay)
+                continue
+
+            logger.warning("  [!] API Key #%d quota exceeded.", key_index + 1)
+            if api_manager.rotate_to_next(key_index):
+                logger.info("  [>] Rotating to API Key #%d...", api_manager.get_current_key_number())
+                continue  # Retry with new key
+            else:
+                raise AllKeysExhaustedError("All API keys have been exhausted")
+
+        # Check for other quota-related errors in response
+        if response.status_code == 403:
+            try:
+                error_data = orjson.loads(response.content)
+                error_reason = next((
+                    reason for error in error_data.get('error', {}).get('errors', ())
+                    if (reason := error.get('reason')) in _QUOTA_REASONS
+                ), None)
+                if error_reason:
+                    if api_manager.current_index != key_index:
+                        continue  # Another search already rotated away from this key
+
+                    logger.warning("  [!] API Key #%d quota exceeded (%s).", key_index + 1, error_reason)
+                    if api_manager.rotate_to_next(key_index):
+                        logger.info("  [>] Rotating to API Key #%d...", api_manager.get_current_key_number())
+                        continue
+                    else:
+                        raise AllKeysExhaustedError("All API keys have been exhausted")
+            except (ValueError, AttributeError):
+                pass
+
+        response.raise_for_status()
+        api_manager.record_success(key_index)
+        data = orjson.loads(response.content)
+        _store_cached_page(cache_path, data)
+        return data
+
+
+@dataclass(slots=True)
+class SearchResults:
+    """Image search results as parallel lists, one entry per image."""
+
+    urls: list[str] = field(default_factory=list)
+    sources: list[str] = field(default_factory=list)
+    titles: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def extend(self, items: list[dict]):
+        """Append raw API items to the results."""
+        add_url = self.urls.append
+        add_source = self.sources.append
+        add_title = self.titles.append
+        for item in items:
+            get = item.get
+            image = get('image') or {}
+            add_url(get('link'))
+            add_source(image.get('contextLink', ''))
+            add_title(get('title', ''))
+
+
+def search_images(
+    query: str,
+    api_manager: APIManager,
+    filters: dict = None,
+    count: int = 100
+) -> SearchResults | None:
+    """
+    Search for images using Google Custom Search API.
+
+    The first page is fetched on its own to learn how many results exist;
+    the remaining pages are then requested in waves of SEARCH_PAGE_WAVE
+    concurrent pages. A wave is only sent once the previous one came back
+    full. A short or empty page ends the search: no later wave is sent,
+    pages of its wave not yet sent are cancelled, and nothing past it is used.
+    Pages of that wave already in flight are still billed.
+
+    Args:
+        query: The search query string
+        api_manager: APIManager instance for credentials
+        filters: Dict with optional 'dateRestrict' and 'imgSize' keys
+        count: Number of images to fetch (max 100)
+
+    Returns:
+        - SearchResults if successful (can be empty if no results found)
+        - None if network/API error occurred (allows retry on next run)
+
+    Raises:
+        AllKeysExhaustedError: When all API keys are exhausted
+    """
+    count = min(count, MAX_RESULTS_PER_QUERY)
+    filters = filters or {}
+
+    try:
+        first_page_size = min(RESULTS_PER_PAGE, count)
+        data = _fetch_page(query, api_manager, filters, 1, first_page_size)
+
+        items = data.get('items', [])
+        results = SearchResults()
+        if not items:
+            return results
+
+        results.extend(items)
+
+        # A short first page means there is nothing further to fetch
+        if len(items) < first_page_size:
+            return results
+
+        # totalResults is only an estimate, usually far above what can be
+        # fetched: it bounds the pages, while the waves decide how many are sent
+        total_results = int(data.get('searchInformation', {}).get('totalResults', 0))
+        available = min(count, max(total_results, len(results)))
+        page_starts = range(1 + RESULTS_PER_PAGE, available + 1, RESULTS_PER_PAGE)
+        page_sizes = [min(RESULTS_PER_PAGE, available - start + 1) for start in page_starts]
+
+        if page_starts:
+            executor = ThreadPoolExecutor(max_workers=min(SEARCH_PAGE_WAVE, len(page_starts)))
+            try:
+                for wave in range(0, len(page_starts), SEARCH_PAGE_WAVE):
+                    wave_sizes = page_sizes[wave:wave + SEARCH_PAGE_WAVE]
+                    futures = [
+                        executor.submit(_fetch_page, query, api_manager, filters, start, size)
+                        for start, size in zip(page_starts[wave:wave + SEARCH_PAGE_WAVE], wave_sizes)
+                    ]
+
+                    short_page = False
+                    for future, page_size in zip(futures, wave_sizes):
+                        items = future.result().get('items', [])
+                        results.extend(items)
+                        if len(items) < page_size:
+                            short_page = True  # Later pages hold no further results
+                            break
+                    if short_page:
+                        break
+            finally:
+                # Drop pages not yet sent; ones in flight finish in the background
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    except requests.exceptions.RequestException as e:
+        logger.error("  API request failed: %s", e)
+        return None  # Return None to indicate network error (can retry)
+    except ValueError as e:
+        logger.error("  Failed to parse API response: %s", e)
+        return None  # Return None to indicate error (can retry)
 
     return results
 
 
+def search_many(
+    jobs: Iterable[tuple[str, dict]],
+    api_manager: APIManager,
+    count: int = 100,
+    max_workers: int = SEARCH_WORKERS,
+    lookahead: int = SEARCH_LOOKAHEAD
+) -> Iterator[SearchResults | None]:
+    """
+    Run several searches concurrently, yielding results in job order.
+
+    At most lookahead jobs are in flight or waiting to be consumed; a new
+    one is submitted each time a result is handed out, so searching keeps
+    running while the caller downloads. At most max_workers run at once.
+
+    Once any key has been rate limited or exhausted, only one job searches
+    at a time, in order, so the remaining quota is not spread over
+    speculative searches that may never complete.
+
+    Args:
+        jobs: Iterable of (query, filters) pairs, consumed lazily
+        api_manager: APIManager instance for credentials
+        count: Number of images to fetch per job (max 100)
+        max_workers: Maximum number of concurrent searches
+        lookahead: Maximum number of results searched ahead of the caller
+
+    Yields:
+        The search_images result of each job, in the order given
+
+    Raises:
+        AllKeysExhaustedError: On reaching a job that ran out of API keys
+    """
+    jobs = iter(jobs)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = deque(
+            executor.submit(search_images, query, api_manager, filters, count)
+            for query, filters in islice(jobs, max(1, lookahead))
+        )
+        while pending:
+            result = pending.popleft().result()
+            if not pending or not api_manager.quota_pressure:
+                for query, filters in islice(jobs, 1):
+                    pending.append(executor.submit(search_images, query, api_manager, filters, count))
+            yield result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
 def format_filter_display(filters: dict) -> str:
     """Format filters for display."""
     if not filters:
@@ -1,13 +1,39 @@
 """Utility functions for the pothole image scraper."""
 
-import hashlib
+import mmap
+import os
 import re
+from collections.abc import Iterator
 from urllib.parse import urlparse
 
+# Patterns used by sanitize_filename, compiled once
+_PROTOCOL_RE = re.compile(r'^https?://')
+_UNSAFE_RE = re.compile(r'[/:?&=%#\\\s]+')
+_DISALLOWED_RE = re.compile(r'[^a-zA-Z0-9\-.]')
+_HYPHENS_RE = re.compile(r'-+')
 
-def compute_hash(content: bytes) -> str:
-    """Compute SHA-256 hash of content."""
-    return hashlib.sha256(content).hexdigest()
+# Every ASCII byte except letters, digits, hyphen and dot
+_DISALLOWED_ASCII = bytes(
+    c for c in range(128) if not (chr(c).isalnum() or chr(c) in '-.')
+)
+
+# Content type -> file extension
+_CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/bmp': '.bmp',
+    'image/tiff': '.tiff',
+    'image/svg+xml': '.svg',
+}
+
+# Image extensions recognized in URL paths
+_IMAGE_EXTENSIONS = frozenset({'.jpg', '.png', '.gif', '.webp', '.bmp', '.tiff', '.svg'})
+
+# Content types that carry arbitrary bytes and may still be images
+_BINARY_CONTENT_TYPES = frozenset({'application/octet-stream', 'binary/octet-stream'})
 
 
 def sanitize_filename(url: str, max_length: int = 100) -> str:
@@ -22,16 +48,20 @@ def sanitize_filename(url: str, max_length: int = 100) -> str:
         A filesystem-safe string derived from the URL
     """
     # Remove protocol
-    sanitized = re.sub(r'^https?://', '', url)
+    sanitized = _PROTOCOL_RE.sub('', url)
 
     # Replace unsafe characters with hyphens
-    sanitized = re.sub(r'[/:?&=%#\\\s]+', '-', sanitized)
+    sanitized = _UNSAFE_RE.sub('-', sanitized)
 
     # Remove any remaining non-alphanumeric characters except hyphen and dot
-    sanitized = re.sub(r'[^a-zA-Z0-9\-.]', '', sanitized)
+    # (bytes.translate for plain ASCII URLs, regex otherwise)
+    if sanitized.isascii():
+        sanitized = sanitized.encode('ascii').translate(None, _DISALLOWED_ASCII).decode('ascii')
+    else:
+        sanitized = _DISALLOWED_RE.sub('', sanitized)
 
     # Collapse multiple hyphens
-    sanitized = re.sub(r'-+', '-', sanitized)
+    sanitized = _HYPHENS_RE.sub('-', sanitized)
 
     # Remove leading/trailing hyphens
     sanitized = sanitized.strip('-')
@@ -43,6 +73,26 @@ def sanitize_filename(url: str, max_length: int = 100) -> str:
     return sanitized
 
 
+def is_image_content_type(content_type: str) -> bool:
+    """
+    Check whether a Content-Type header may describe an image.
+
+    Missing and generic binary types are accepted, since many servers
+    send images without a precise type.
+
+    Args:
+        content_type: The Content-Type header value (may be empty)
+
+    Returns:
+        False only if the header names a definite non-image type
+    """
+    base_type = content_type.split(';')[0].strip().lower()
+    if not base_type:
+        return True
+
+    return base_type.startswith('image/') or base_type in _BINARY_CONTENT_TYPES
+
+
 def get_file_extension(url: str, content_type: str = None) -> str:
     """
     Determine file extension from URL or content type.
@@ -56,34 +106,46 @@ def get_file_extension(url: str, content_type: str = None) -> str:
     """
     # Try to get extension from content type first
     if content_type:
-        content_type_map = {
-            'image/jpeg': '.jpg',
-            'image/jpg': '.jpg',
-            'image/png': '.png',
-            'image/gif': '.gif',
-            'image/webp': '.webp',
-            'image/bmp': '.bmp',
-            'image/tiff': '.tiff',
-            'image/svg+xml': '.svg',
-        }
         # Extract base content type (remove parameters like charset)
         base_type = content_type.split(';')[0].strip().lower()
-        if base_type in content_type_map:
-            return content_type_map[base_type]
+        if base_type in _CONTENT_TYPE_EXTENSIONS:
+            return _CONTENT_TYPE_EXTENSIONS[base_type]
 
     # Fall back to URL parsing
-    parsed = urlparse(url)
-    path = parsed.path.lower()
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    if ext in _IMAGE_EXTENSIONS:
+        return ext
 
-    # Common image extensions
-    for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tiff', '.svg']:
-        if path.endswith(ext):
-            return '.jpg' if ext == '.jpeg' else ext
-
-    # Default to .jpg if unknown
+    # '.jpeg' and anything unknown map to .jpg
     return '.jpg'
 
 
+def iter_queries(filepath: str) -> Iterator[str]:
+    """
+    Lazily yield search queries from a text file.
+
+    The file is memory-mapped and split line by line, so large query
+    lists are never loaded into memory as a whole.
+
+    Args:
+        filepath: Path to the queries file
+
+    Yields:
+        Query strings
+    """
+    with open(filepath, 'rb') as f:
+        # mmap cannot map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for raw in iter(mm.readline, b''):
+                line = raw.decode('utf-8').strip()
+                # Skip empty lines and comments
+                if line and not line.startswith('#'):
+                    yield line
+
+
 def read_queries_from_file(filepath: str) -> list[str]:
     """
     Read search queries from a text file.
@@ -94,13 +156,4 @@ def read_queries_from_file(filepath: str) -> list[str]:
     Returns:
         List of query strings
     """
-    queries = []
-
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            # Skip empty lines and comments
-            if line and not line.startswith('#'):
-                queries.append(line)
-
-    return queries
+    return list(iter_queries(filepath))